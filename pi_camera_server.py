@@ -5,203 +5,536 @@ Captures a photo with Pi Camera and serves it via local web server
 Designed for Pi Zero W running Bookworm
 """
 
+import fcntl
+import gzip
+import io
+import json
+import logging
+import logging.handlers
 import os
+import queue
+import shutil
+import struct
+import subprocess
+import sys
+import threading
 import time
 from datetime import datetime
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse
 import socket
 
+try:
+    from picamera2 import Picamera2
+    from picamera2.encoders import MJPEGEncoder
+    from picamera2.outputs import FileOutput
+except ImportError:
+    Picamera2 = None
+
 # Configuration
 PHOTO_DIR = "/tmp/picam"
 PHOTO_NAME = "current_photo.jpg"
 SERVER_PORT = 8080
 
+# Request logging goes through a queue to a background writer thread,
+# so the request thread never blocks on a stdout write or formats a
+# timestamp. Set PISTREAM_QUIET to drop request logs entirely.
+_QUIET = bool(os.environ.get("PISTREAM_QUIET"))
+_log_queue = queue.Queue(-1)
+_logger = logging.getLogger("pi_camera_server")
+_logger.setLevel(logging.INFO)
+_logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+_logger.propagate = False
+
+def _start_log_listener():
+    """Start the thread that formats and writes queued log records"""
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(logging.Formatter('[%(asctime)s] %(message)s',
+                                          '%Y-%m-%d %H:%M:%S'))
+    listener = logging.handlers.QueueListener(_log_queue, stream)
+    listener.start()
+    return listener
+
+# Static HTML page, encoded and gzipped once at import. The timestamp
+# is filled in client-side from /meta, so the page itself never changes
+# and both the plain and compressed responses can be fully prebuilt.
+HTML_PAGE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Pi Camera Viewer</title>
+    <meta name="viewport" content="width=device-width, initial-scale=1">
+    <style>
+        body {
+            font-family: Arial, sans-serif;
+            max-width: 800px;
+            margin: 0 auto;
+            padding: 20px;
+            background-color: #f0f0f0;
+        }
+        .container {
+            background-color: white;
+            padding: 20px;
+            border-radius: 10px;
+            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
+        }
+        h1 {
+            color: #333;
+            text-align: center;
+        }
+        .photo-container {
+            text-align: center;
+            margin: 20px 0;
+        }
+        img {
+            max-width: 100%;
+            height: auto;
+            border: 2px solid #ddd;
+            border-radius: 5px;
+        }
+        .buttons {
+            text-align: center;
+            margin: 20px 0;
+        }
+        button {
+            background-color: #4CAF50;
+            color: white;
+            padding: 10px 20px;
+            border: none;
+            border-radius: 5px;
+            cursor: pointer;
+            font-size: 16px;
+            margin: 0 10px;
+        }
+        button:hover {
+            background-color: #45a049;
+        }
+        .info {
+            background-color: #e7f3ff;
+            padding: 10px;
+            border-radius: 5px;
+            margin: 10px 0;
+        }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>Pi Camera Viewer</h1>
+        <div class="info">
+            <strong>Last photo taken:</strong> <span id="timestamp">Loading...</span>
+        </div>
+        <div class="photo-container">
+            <img src="/photo" alt="Pi Camera Photo" id="photo">
+        </div>
+        <div class="buttons">
+            <button onclick="takeNewPhoto()">Take New Photo</button>
+            <button onclick="refreshPhoto()">Refresh</button>
+        </div>
+    </div>
+
+    <script>
+        function takeNewPhoto() {
+            fetch('/capture')
+                .then(response => response.text())
+                .then(data => {
+                    alert('New photo captured!');
+                    refreshPhoto();
+                })
+                .catch(error => {
+                    alert('Error taking photo: ' + error);
+                });
+        }
+
+        function refreshPhoto() {
+            fetch('/meta')
+                .then(response => response.json())
+                .then(meta => {
+                    document.getElementById('timestamp').textContent = meta.ts;
+                    document.getElementById('photo').src = '/photo';
+                })
+                .catch(error => console.log('Refresh failed: ' + error));
+        }
+
+        // Fill in the timestamp on load, then auto-refresh every 30 seconds
+        refreshPhoto();
+        setInterval(refreshPhoto, 30000);
+    </script>
+</body>
+</html>
+"""
+
+_HTML_BYTES = HTML_PAGE.encode('utf-8')
+_HTML_GZIP = gzip.compress(_HTML_BYTES, 9)
+
+# Complete / responses (headers + body) prebuilt as single blobs
+_HTML_RESP = (b"HTTP/1.1 200 OK\r\n"
+              b"Content-Type: text/html\r\n"
+              b"Vary: Accept-Encoding\r\n"
+              b"Content-Length: %d\r\n"
+              b"\r\n" % len(_HTML_BYTES)) + _HTML_BYTES
+_HTML_GZIP_RESP = (b"HTTP/1.1 200 OK\r\n"
+                   b"Content-Type: text/html\r\n"
+                   b"Vary: Accept-Encoding\r\n"
+                   b"Content-Encoding: gzip\r\n"
+                   b"Content-Length: %d\r\n"
+                   b"\r\n" % len(_HTML_GZIP)) + _HTML_GZIP
+
+def _plain_response(status, body):
+    """Prebuild a complete fixed HTTP response as one bytes blob"""
+    return (f"HTTP/1.1 {status}\r\n"
+            f"Content-Type: text/plain\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"\r\n").encode('ascii') + body
+
+# Fixed responses and the /photo header block are assembled once at
+# import and written with a single wfile.write, skipping send_response's
+# per-call date formatting and the one-write-per-header pattern
+_RESP_404 = _plain_response("404 Not Found", b"Not found")
+_RESP_PHOTO_404 = _plain_response("404 Not Found", b"Photo not found")
+_RESP_CAPTURE_OK = _plain_response("200 OK", b"Photo captured successfully")
+_RESP_CAPTURE_FAIL = _plain_response(
+    "500 Internal Server Error", b"Failed to capture photo")
+_RESP_SNAPSHOT_UNAVAILABLE = _plain_response(
+    "503 Service Unavailable", b"Live snapshot requires picamera2")
+_RESP_SNAPSHOT_FAIL = _plain_response(
+    "500 Internal Server Error", b"Snapshot failed")
+
+_PHOTO_HDR_TMPL = (b"HTTP/1.1 200 OK\r\n"
+                   b"Content-Type: image/jpeg\r\n"
+                   b"Cache-Control: public, max-age=30, must-revalidate\r\n"
+                   b"ETag: %b\r\n"
+                   b"Content-Length: %d\r\n"
+                   b"\r\n")
+_SNAPSHOT_HDR_TMPL = (b"HTTP/1.1 200 OK\r\n"
+                      b"Content-Type: image/jpeg\r\n"
+                      b"Cache-Control: no-store\r\n"
+                      b"Content-Length: %d\r\n"
+                      b"\r\n")
+_NOT_MODIFIED_TMPL = b"HTTP/1.1 304 Not Modified\r\nETag: %b\r\n\r\n"
+_META_HDR_TMPL = (b"HTTP/1.1 200 OK\r\n"
+                  b"Content-Type: application/json\r\n"
+                  b"Cache-Control: no-store\r\n"
+                  b"Content-Length: %d\r\n"
+                  b"\r\n")
+
 class CameraWebHandler(BaseHTTPRequestHandler):
     """HTTP request handler for serving the camera photo and web interface"""
-    
+
+    # Every response carries a Content-Length, so the connection can
+    # stay open and the 30s auto-refresh reuses it instead of paying a
+    # TCP handshake per cycle
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Don't let Nagle delay the many small header writes; packet
+        # boundaries are controlled explicitly with TCP_CORK below
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _cork(self, enable):
+        """Toggle TCP_CORK so headers and body leave as a single packet"""
+        self.connection.setsockopt(
+            socket.IPPROTO_TCP, socket.TCP_CORK, 1 if enable else 0)
+
+    def _sendfile_fd(self, file_fd, size):
+        """Copy size bytes from an fd to the socket with raw os.sendfile"""
+        sock_fd = self.connection.fileno()
+        offset = 0
+        remaining = size
+        while remaining > 0:
+            sent = os.sendfile(sock_fd, file_fd, offset, remaining)
+            if sent == 0:
+                break
+            offset += sent
+            remaining -= sent
+
+    def _sendfile(self, path, size):
+        """Copy a file to the socket with raw os.sendfile calls"""
+        file_fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(file_fd, 0, size, os.POSIX_FADV_SEQUENTIAL)
+            self._sendfile_fd(file_fd, size)
+        finally:
+            os.close(file_fd)
+
     def do_GET(self):
         parsed_path = urlparse(self.path)
         
         if parsed_path.path == '/':
-            # Serve the main HTML page
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html')
-            self.end_headers()
-            
-            html_content = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>Pi Camera Viewer</title>
-                <meta name="viewport" content="width=device-width, initial-scale=1">
-                <style>
-                    body {{
-                        font-family: Arial, sans-serif;
-                        max-width: 800px;
-                        margin: 0 auto;
-                        padding: 20px;
-                        background-color: #f0f0f0;
-                    }}
-                    .container {{
-                        background-color: white;
-                        padding: 20px;
-                        border-radius: 10px;
-                        box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-                    }}
-                    h1 {{
-                        color: #333;
-                        text-align: center;
-                    }}
-                    .photo-container {{
-                        text-align: center;
-                        margin: 20px 0;
-                    }}
-                    img {{
-                        max-width: 100%;
-                        height: auto;
-                        border: 2px solid #ddd;
-                        border-radius: 5px;
-                    }}
-                    .buttons {{
-                        text-align: center;
-                        margin: 20px 0;
-                    }}
-                    button {{
-                        background-color: #4CAF50;
-                        color: white;
-                        padding: 10px 20px;
-                        border: none;
-                        border-radius: 5px;
-                        cursor: pointer;
-                        font-size: 16px;
-                        margin: 0 10px;
-                    }}
-                    button:hover {{
-                        background-color: #45a049;
-                    }}
-                    .info {{
-                        background-color: #e7f3ff;
-                        padding: 10px;
-                        border-radius: 5px;
-                        margin: 10px 0;
-                    }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <h1>Pi Camera Viewer</h1>
-                    <div class="info">
-                        <strong>Last photo taken:</strong> {get_photo_timestamp()}
-                    </div>
-                    <div class="photo-container">
-                        <img src="/photo" alt="Pi Camera Photo" id="photo">
-                    </div>
-                    <div class="buttons">
-                        <button onclick="takeNewPhoto()">Take New Photo</button>
-                        <button onclick="refreshPhoto()">Refresh</button>
-                    </div>
-                </div>
-                
-                <script>
-                    function takeNewPhoto() {{
-                        fetch('/capture')
-                            .then(response => response.text())
-                            .then(data => {{
-                                alert('New photo captured!');
-                                refreshPhoto();
-                            }})
-                            .catch(error => {{
-                                alert('Error taking photo: ' + error);
-                            }});
-                    }}
-                    
-                    function refreshPhoto() {{
-                        document.getElementById('photo').src = '/photo?' + new Date().getTime();
-                        location.reload();
-                    }}
-                    
-                    // Auto-refresh every 30 seconds
-                    setInterval(refreshPhoto, 30000);
-                </script>
-            </body>
-            </html>
-            """
-            self.wfile.write(html_content.encode())
-            
-        elif parsed_path.path == '/photo':
-            # Serve the photo
-            photo_path = os.path.join(PHOTO_DIR, PHOTO_NAME)
-            if os.path.exists(photo_path):
-                self.send_response(200)
-                self.send_header('Content-type', 'image/jpeg')
-                self.send_header('Cache-Control', 'no-cache')
-                self.end_headers()
-                
-                with open(photo_path, 'rb') as f:
-                    self.wfile.write(f.read())
+            # Serve the prebuilt page, compressed when the client allows
+            if 'gzip' in self.headers.get('Accept-Encoding', ''):
+                self.wfile.write(_HTML_GZIP_RESP)
             else:
-                self.send_response(404)
-                self.end_headers()
-                self.wfile.write(b'Photo not found')
-                
+                self.wfile.write(_HTML_RESP)
+
+        elif parsed_path.path == '/photo':
+            # Serve the photo: sendfile from the memfd when we have one,
+            # disk fallback with cached metadata (no stats per request)
+            memfd = None
+            with _photo_lock:
+                if _PHOTO_MEMFD is not None:
+                    memfd = os.dup(_PHOTO_MEMFD)
+                    size = _LATEST_SIZE
+                    mtime = _LATEST_MTIME
+                else:
+                    size = _PHOTO_SIZE
+                    mtime = _PHOTO_MTIME
+
+            try:
+                if size is None:
+                    self.wfile.write(_RESP_PHOTO_404)
+                    return
+
+                etag = b'"%d-%d"' % (int(mtime), size)
+
+                # Unchanged photo: let the browser keep its cached copy
+                if self.headers.get('If-None-Match', '').encode('ascii', 'ignore') == etag:
+                    self.wfile.write(_NOT_MODIFIED_TMPL % etag)
+                    return
+
+                self._cork(True)
+                self.wfile.write(_PHOTO_HDR_TMPL % (etag, size))
+
+                # Drain the header buffer, then drive sendfile(2) directly:
+                # the kernel copies pages straight from memory (or the page
+                # cache) to the socket with no Python bytes object in between
+                self.wfile.flush()
+                if memfd is not None:
+                    self._sendfile_fd(memfd, size)
+                else:
+                    self._sendfile(os.path.join(PHOTO_DIR, PHOTO_NAME), size)
+                self._cork(False)
+            finally:
+                if memfd is not None:
+                    os.close(memfd)
+
+        elif parsed_path.path == '/snapshot':
+            # Capture and stream a fresh JPEG without touching the SD card
+            if _PICAM is None:
+                self.wfile.write(_RESP_SNAPSHOT_UNAVAILABLE)
+                return
+
+            try:
+                data = _grab_jpeg()
+            except Exception as e:
+                print(f"Snapshot failed: {e}")
+                self.wfile.write(_RESP_SNAPSHOT_FAIL)
+                return
+
+            self._cork(True)
+            self.wfile.write(_SNAPSHOT_HDR_TMPL % len(data))
+            self.wfile.write(data)
+            self.wfile.flush()
+            self._cork(False)
+
+        elif parsed_path.path == '/meta':
+            # Tiny JSON payload so the page can refresh its timestamp
+            # without re-downloading the whole HTML
+            body = json.dumps({"ts": get_photo_timestamp()}).encode('utf-8')
+            self.wfile.write(_META_HDR_TMPL % len(body))
+            self.wfile.write(body)
+
         elif parsed_path.path == '/capture':
             # Capture a new photo
             if capture_photo():
-                self.send_response(200)
-                self.send_header('Content-type', 'text/plain')
-                self.end_headers()
-                self.wfile.write(b'Photo captured successfully')
+                self.wfile.write(_RESP_CAPTURE_OK)
             else:
-                self.send_response(500)
-                self.end_headers()
-                self.wfile.write(b'Failed to capture photo')
+                self.wfile.write(_RESP_CAPTURE_FAIL)
         else:
-            self.send_response(404)
-            self.end_headers()
-            self.wfile.write(b'Not found')
+            self.wfile.write(_RESP_404)
     
     def log_message(self, format, *args):
-        """Override to customize logging"""
-        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {format % args}")
+        """Enqueue the record; timestamping and I/O happen off-thread"""
+        if not _QUIET:
+            _logger.info(format, *args)
 
 def setup_camera():
     """Initialize camera settings and directory"""
+    global _PICAM
+
     # Create photo directory if it doesn't exist
     os.makedirs(PHOTO_DIR, exist_ok=True)
-    
-    # Check if camera is available
-    try:
-        # Test camera with a quick capture
-        test_cmd = f"libcamera-still --immediate --output /tmp/test_cam.jpg --width 640 --height 480 --timeout 1"
-        result = os.system(test_cmd)
-        if result == 0:
-            os.remove("/tmp/test_cam.jpg")
-            print("Camera test successful")
+
+    # Prime the metadata cache once in case a photo survived a restart
+    _update_photo_metadata(os.path.join(PHOTO_DIR, PHOTO_NAME))
+
+    # Prefer a persistent picamera2 pipeline: opening the sensor and
+    # converging AE/AWB happens once here instead of on every capture
+    if Picamera2 is not None:
+        global _ENCODER_OUTPUT
+        try:
+            _PICAM = Picamera2()
+            _PICAM.configure(_PICAM.create_video_configuration(
+                main={"size": (1640, 1232), "format": "YUV420"}))
+            _PICAM.start()
+        except Exception as e:
+            print(f"picamera2 init failed, falling back to libcamera-still: {e}")
+            _PICAM = None
+        if _PICAM is not None:
+            # Keep the hardware MJPEG encoder running so JPEG encoding
+            # happens on the VideoCore, not the ARM core
+            try:
+                _ENCODER_OUTPUT = _LatestFrameOutput()
+                _PICAM.start_encoder(MJPEGEncoder(),
+                                     FileOutput(_ENCODER_OUTPUT))
+                print("Camera ready (hardware MJPEG encoder)")
+            except Exception as e:
+                _ENCODER_OUTPUT = None
+                print(f"Hardware encoder unavailable, using capture_file: {e}")
+                print("Camera ready (persistent picamera2 pipeline)")
             return True
-        else:
-            print("Camera test failed")
-            return False
-    except Exception as e:
-        print(f"Camera setup error: {e}")
-        return False
+
+    # Fallback mode: opening the pipeline above is the real camera test,
+    # so just confirm the tool exists -- the initial capture in main()
+    # will surface any camera problem without a throwaway test frame
+    if shutil.which("libcamera-still"):
+        print("Camera ready (libcamera-still)")
+        return True
+    print("Camera not available: no picamera2 and no libcamera-still on PATH")
+    return False
+
+# Only one libcamera invocation may run at a time (the camera device
+# can't be shared), but request threads never block on it
+_capture_lock = threading.Lock()
+
+# Persistent camera pipeline: opened once at startup so the sensor stays
+# warm and AE/AWB stay converged between captures. None means we fall
+# back to spawning libcamera-still per capture.
+_PICAM = None
+
+# Output sink for the continuous hardware MJPEG encoder. When running,
+# JPEG encoding happens on the VideoCore block and the ARM core only
+# ever copies finished frames; captures become a frame grab.
+_ENCODER_OUTPUT = None
+
+class _LatestFrameOutput(io.BufferedIOBase):
+    """File-like sink that keeps only the newest encoded JPEG frame"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.frame = None
+
+    def writable(self):
+        return True
+
+    def write(self, buf):
+        with self.lock:
+            self.frame = bytes(buf)
+        return len(buf)
+
+    def read_frame(self):
+        with self.lock:
+            return self.frame
+
+# Latest encoded JPEG, kept in an anonymous memfd so /photo can
+# sendfile it from kernel memory -- no filesystem inode, no SD card.
+# The disk copy is only a background mirror for persistence.
+# _PHOTO_SIZE/_PHOTO_MTIME cache the mirror's metadata so the disk
+# fallback path never stats the SD card per request either.
+_photo_lock = threading.Lock()
+_PHOTO_MEMFD = None
+_LATEST_SIZE = 0
+_LATEST_MTIME = 0.0
+_PHOTO_SIZE = None
+_PHOTO_MTIME = 0.0
+
+def _store_latest_jpeg(data):
+    """Swap the latest JPEG into a fresh memfd.
+
+    Serving threads dup the fd under the lock before the swap can close
+    it, so an in-flight sendfile never sees a half-overwritten image.
+    """
+    global _PHOTO_MEMFD, _LATEST_SIZE, _LATEST_MTIME
+    memfd = os.memfd_create("pijpeg")
+    os.write(memfd, data)
+    with _photo_lock:
+        old = _PHOTO_MEMFD
+        _PHOTO_MEMFD = memfd
+        _LATEST_SIZE = len(data)
+        _LATEST_MTIME = time.time()
+    if old is not None:
+        os.close(old)
+
+def _update_photo_metadata(photo_path):
+    """Refresh the cached size/mtime after the disk copy changes"""
+    global _PHOTO_SIZE, _PHOTO_MTIME
+    try:
+        st = os.stat(photo_path)
+    except OSError:
+        return
+    with _photo_lock:
+        _PHOTO_SIZE = st.st_size
+        _PHOTO_MTIME = st.st_mtime
+
+def _fadvise_willneed(photo_path):
+    """Ask the kernel to prefetch the photo so sendfile won't block on SD reads"""
+    try:
+        fd = os.open(photo_path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+def _mirror_photo_to_disk(photo_path, data):
+    """Write the latest JPEG to disk off the request path (persistence only)"""
+    try:
+        with open(photo_path, 'wb') as f:
+            f.write(data)
+    except OSError as e:
+        print(f"Photo mirror failed: {e}")
+        return
+    _update_photo_metadata(photo_path)
+    _fadvise_willneed(photo_path)
+
+def _grab_jpeg():
+    """Get a fresh JPEG from the hardware encoder stream (or capture one)"""
+    if _ENCODER_OUTPUT is not None:
+        frame = _ENCODER_OUTPUT.read_frame()
+        if frame is not None:
+            return frame
+    buf = io.BytesIO()
+    with _capture_lock:
+        _PICAM.capture_file(buf, format='jpeg')
+    return buf.getvalue()
 
 def capture_photo():
-    """Capture a photo using libcamera-still"""
+    """Capture a photo using the persistent pipeline (or libcamera-still)"""
     photo_path = os.path.join(PHOTO_DIR, PHOTO_NAME)
-    
+
     try:
-        # Use libcamera-still for Bookworm
-        cmd = f"libcamera-still --output {photo_path} --width 1640 --height 1232 --timeout 2000 --immediate"
-        print(f"Capturing photo: {cmd}")
-        
-        result = os.system(cmd)
-        
-        if result == 0 and os.path.exists(photo_path):
+        if _PICAM is not None:
+            # Sensor and encoder are already running: this is just a
+            # grab of the newest hardware-encoded frame. The SD card is
+            # only touched by the mirror thread.
+            data = _grab_jpeg()
+            _store_latest_jpeg(data)
+            threading.Thread(target=_mirror_photo_to_disk,
+                             args=(photo_path, data), daemon=True).start()
+            print(f"Photo captured ({len(data)} bytes)")
+            return True
+
+        # Use libcamera-still for Bookworm (no shell, direct exec)
+        cmd = ["libcamera-still", "--output", photo_path,
+               "--width", "1640", "--height", "1232",
+               "--timeout", "2000", "--immediate"]
+        print(f"Capturing photo: {' '.join(cmd)}")
+
+        with _capture_lock:
+            proc = subprocess.run(
+                cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        if proc.returncode == 0 and os.path.exists(photo_path):
+            # Pull the file into the memfd once so /photo serves without SD I/O
+            with open(photo_path, 'rb') as f:
+                _store_latest_jpeg(f.read())
+            _update_photo_metadata(photo_path)
+            _fadvise_willneed(photo_path)
             print(f"Photo saved: {photo_path}")
             return True
         else:
-            print(f"Photo capture failed (exit code: {result})")
+            print(f"Photo capture failed (exit code: {proc.returncode})")
             return False
             
     except Exception as e:
@@ -209,24 +542,47 @@ def capture_photo():
         return False
 
 def get_photo_timestamp():
-    """Get the timestamp of the current photo"""
-    photo_path = os.path.join(PHOTO_DIR, PHOTO_NAME)
-    if os.path.exists(photo_path):
-        timestamp = os.path.getmtime(photo_path)
+    """Get the timestamp of the current photo (from the cached metadata)"""
+    with _photo_lock:
+        timestamp = _LATEST_MTIME or _PHOTO_MTIME
+    if timestamp:
         return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
     return "No photo available"
 
+_SIOCGIFADDR = 0x8915
+_LOCAL_IP = None
+
 def get_local_ip():
-    """Get the local IP address"""
+    """Get the local IP address by asking the kernel for interface addresses.
+
+    Uses the SIOCGIFADDR ioctl on each non-loopback interface, so it
+    works offline and sends no packets. The result is cached.
+    """
+    global _LOCAL_IP
+    if _LOCAL_IP is not None:
+        return _LOCAL_IP
+
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     try:
-        # Connect to a remote address to determine local IP
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        s.connect(("8.8.8.8", 80))
-        ip = s.getsockname()[0]
+        for _, name in socket.if_nameindex():
+            if name == 'lo':
+                continue
+            try:
+                ifreq = fcntl.ioctl(
+                    s.fileno(), _SIOCGIFADDR,
+                    struct.pack('256s', name[:15].encode()))
+            except OSError:
+                # Interface has no IPv4 address (e.g. down) -- keep looking
+                continue
+            _LOCAL_IP = socket.inet_ntoa(ifreq[20:24])
+            return _LOCAL_IP
+    except OSError:
+        pass
+    finally:
         s.close()
-        return ip
-    except:
-        return "127.0.0.1"
+
+    _LOCAL_IP = "127.0.0.1"
+    return _LOCAL_IP
 
 def main():
     """Main function to start the camera web server"""
@@ -243,9 +599,10 @@ def main():
     if not capture_photo():
         print("Initial photo capture failed, but server will start anyway")
     
-    # Start web server
+    # Start web server (threaded so a slow capture doesn't stall other requests)
     server_address = ('', SERVER_PORT)
-    httpd = HTTPServer(server_address, CameraWebHandler)
+    httpd = ThreadingHTTPServer(server_address, CameraWebHandler)
+    httpd.daemon_threads = True
     
     local_ip = get_local_ip()
     
@@ -259,11 +616,14 @@ def main():
     print(f"   • Press Ctrl+C to stop the server")
     print("=" * 50)
     
+    log_listener = _start_log_listener()
     try:
         httpd.serve_forever()
     except KeyboardInterrupt:
         print("\n\nServer stopped by user")
         httpd.server_close()
+    finally:
+        log_listener.stop()
 
 if __name__ == "__main__":
     main()